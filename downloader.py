@@ -1,91 +1,320 @@
+import asyncio
+import hashlib
+import io
+import json
 import os
+import tarfile
+import time
+from collections import deque
+from dataclasses import dataclass
+from operator import itemgetter
 
-from lib.ggn_client import GGNClient, GGNClientException
+import diskcache
+
+from lib.ggn_client import GGNClientException
+from lib.ggn_client_async import AsyncGGNClient
 import argparse
 
-print("Starting GGN Console Downloader")
+# add consoles you wish to obtain here
+CONSOLE_LIST = ['Atari 2600']
+
+# number of search pages requested at once while paginating a console
+PAGE_WINDOW = 4
+# directory search results are cached in between runs
+CACHE_DIRECTORY = "./.ggn_cache"
+# file the newest upload time seen per console is kept in for incremental runs
+STATE_FILE = os.path.expanduser("~/.ggn_downloader_state.json")
+# (order_by, order_way) used for full and incremental searches
+FULL_ORDER = ("groupname", "asc")
+INCREMENTAL_ORDER = ("time", "desc")
 
-parser = argparse.ArgumentParser("downloader")
-parser.add_argument("--token",
-                    help="GGN token to use for downloading torrents. Overrides the environment variable `GGN_TOKEN` "
-                         "which may also be used to set the to",
-                    default=None, required=False)
-parser.add_argument("--dry",
-                    help="When dry is true, torrents will not be downloaded. Instead, their links will be printed.",
-                    default=True, required=False)
-parser.add_argument("--write_location", help="Location to write the torrent files to.", default="./", required=False)
-args = parser.parse_args()
 
-token = args.token if args.token is not None else os.getenv("GGN_TOKEN")
+@dataclass(slots=True)
+class Pick:
+    """the torrent picked for download from a group"""
+    torrent_id: str
+    release_title: str
+    seeders: int
 
-print(f"building client.")
 
-client = GGNClient(token)
+async def search_page(client, cache, cache_ttl, **search_args):
+    """returns a page of search results, served from the cache when it was fetched less than `cache_ttl` seconds ago"""
+    if cache is None:
+        return await client.search_torrents(**search_args)
 
-torrent_data = {}
+    key = ("search_torrents",) + tuple(sorted(search_args.items()))
+    result = cache.get(key)
+    if result is None:
+        result = await client.search_torrents(**search_args)
+        cache.set(key, result, expire=cache_ttl)
+    return result
 
-# add consoles you wish to obtain here
-console_list = ['Atari 2600']
 
-print(f"searching for torrents in {console_list}")
+async def fetch_page(client, cache, cache_ttl, console, page, order):
+    """fetches a single page of search results for a console"""
+    return await search_page(
+        client,
+        cache,
+        cache_ttl,
+        artist_name=console,
+        order_by=order[0],
+        order_way=order[1],
+        page=page,
+        empty_groups="filled",
+    )
+
+
+def process_page(result, torrent_data, since=None):
+    """picks the best seeded torrent of every group on a page of search results
+
+        torrents uploaded at or before `since` are ignored. returns the newest upload time on the page and whether
+        every group on the page still had something newer than `since`, i.e. whether later pages of a time ordered
+        search can hold anything new.
+    """
+    newest = None
+    more = True
+    for (_, torrent) in result.items():
+        if "Torrents" not in torrent:
+            continue
+
+        # if there are no torrents in the group, skip it
+        if len(torrent["Torrents"]) == 0:
+            continue
+
+        if since is not None:
+            group_newest = max(data["Time"] for data in torrent["Torrents"].values())
+            if newest is None or group_newest > newest:
+                newest = group_newest
+            group_is_new = group_newest > since
+
+        candidates = []
+        snatched = None
+        # the search API has no parameters for torrent type, excluding GameDOX or excluding snatched torrents, so
+        # these filters have to be applied here rather than in the query.
+        for (torrent_id, data) in torrent["Torrents"].items():
+            # Filter out non-torrents
+            if data["TorrentType"] != "Torrent":
+                continue
+            # Filter out GameDOX torrents
+            if data["GameDOXType"] != "":
+                continue
+            # Skip already snatched torrents
+            if data["IsSnatched"]:
+                snatched = data
+                break
+            # Skip torrents a previous incremental run already saw. this comes after the snatched check so a group
+            # with an old snatched torrent is skipped just like in a full run.
+            if since is not None and data["Time"] <= since:
+                continue
+            candidates.append((data["Seeders"], torrent_id, data))
+
+        if snatched is not None:
+            print(f"group already snatched ({snatched['ReleaseTitle']}), skipping.")
+            torrent_data.pop(snatched["GroupID"], None)
+        elif candidates:
+            # pick the best seeded torrent of the group in one pass of the builtin max, the first one wins a tie.
+            (seeders, torrent_id, data) = max(candidates, key=itemgetter(0))
+            # only replace the pick if it has more seeds than the current torrent in the group
+            group_id = data["GroupID"]
+            current = torrent_data.get(group_id)
+            if current is None or current.seeders < seeders:
+                torrent_data[group_id] = Pick(torrent_id, data["ReleaseTitle"], seeders)
+
+        # groups come newest first, so once a whole group predates `since` every later group does too
+        if since is not None and not group_is_new:
+            more = False
+
+    return newest, more
+
 
-for console in console_list:
+async def search_console(client, cache, cache_ttl, console, torrent_data, since=None):
+    """searches every page for a console, returns the newest upload time seen when `since` is set
+
+        with `since` set, results are walked newest first and the search stops at the first page reaching torrents
+        that are not newer than `since`.
+    """
     print(f"Searching for torrents for {console} starting at page 1.")
+    order = FULL_ORDER if since is None else INCREMENTAL_ORDER
+    latest = since
     page_number = 1
-    while True:
-        result = client.search_torrents(
-            artist_name=console,
-            order_by="groupname",
-            order_way="asc",
-            page=page_number,
-            empty_groups="filled",
-        )
-        # if no torrents are found on the page, we must be at the end
-        if len(result) == 0:
-            break
-        for (_, torrent) in result.items():
-            if "Torrents" not in torrent:
-                continue
+    # keep a window of pages in flight and request the next one before processing the current page, so
+    # network time overlaps with processing. pages are handled in order so the first empty page ends the search.
+    pending = deque(
+        asyncio.create_task(fetch_page(client, cache, cache_ttl, console, page, order))
+        for page in range(1, PAGE_WINDOW + 1)
+    )
+    try:
+        while True:
+            result = await pending.popleft()
+            if len(result) == 0:
+                return latest
+            pending.append(
+                asyncio.create_task(fetch_page(client, cache, cache_ttl, console, page_number + PAGE_WINDOW, order))
+            )
+            (newest, more) = process_page(result, torrent_data, since)
+            if newest is not None and (latest is None or newest > latest):
+                latest = newest
+            page_number += 1
+            print("Found {} torrents so far next page is {}.".format(len(torrent_data), page_number))
+            if not more:
+                return latest
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def add_to_archive(archive, filename, buffer):
+    """appends a downloaded torrent held in memory to the output tar stream"""
+    info = tarfile.TarInfo(name=filename)
+    info.size = buffer.tell()
+    info.mtime = int(time.time())
+    buffer.seek(0)
+    archive.addfile(info, buffer)
+    print(f"Torrent added to archive as {filename}")
 
-            # if there are no torrents in the group, skip it
-            if len(torrent["Torrents"]) == 0:
-                continue
 
-            for (torrent_id, data) in torrent["Torrents"].items():
-                # Filter out non-torrents
-                if data["TorrentType"] != "Torrent":
-                    continue
-                # Filter out GameDOX torrents
-                if data["GameDOXType"] != "":
-                    continue
-                # Skip already snatched torrents
-                if data["IsSnatched"]:
-                    print(f"group already snatched ({data['ReleaseTitle']}), skipping.")
-                    if data["GroupID"] in torrent_data:
-                        torrent_data.pop(data["GroupID"], None)
-                    break
-
-                # only add torrent if it has more seeds than the current torrent in the group
-                if data["GroupID"] in torrent_data:
-                    if torrent_data[data["GroupID"]]["seeders"] > data["Seeders"]:
-                        continue
-
-                torrent_data[data["GroupID"]] = {
-                    "torrent_id": torrent_id,
-                    "release_title": data["ReleaseTitle"],
-                    "seeders": data["Seeders"],
-                }
-
-        page_number += 1
-        print("Found {} torrents so far next page is {}.".format(len(torrent_data), page_number))
-
-print(f"Found {len(torrent_data)} torrents.")
-
-for (group_id, torrent) in torrent_data.items():
+async def download_one(client, torrent, write_location, filename, archive):
+    """downloads a torrent, returns whether it succeeded"""
     try:
-        client.download_torrent(torrent["torrent_id"], dry=args.dry,
-                                write_location=f"{args.write_location}{group_id}.torrent")
+        if archive is None:
+            await client.download_torrent(torrent.torrent_id, dry=False,
+                                          write_location=os.path.join(write_location, filename))
+            return True
+
+        buffer = io.BytesIO()
+        await client.download_torrent(torrent.torrent_id, dry=False, output=buffer)
+        # the tar stream is only ever written from the event loop, so members never interleave.
+        add_to_archive(archive, filename, buffer)
+        return True
     except GGNClientException as e:
-        print(f"Error downloading torrent {torrent['torrent_id']}: {e}")
+        print(f"Error downloading torrent {torrent.torrent_id}: {e}")
+        return False
+
+
+def load_state():
+    """loads the newest upload time seen per console by earlier incremental runs"""
+    try:
+        with open(STATE_FILE, "r") as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state):
+    with open(STATE_FILE, "w") as state_file:
+        json.dump(state, state_file)
+
+
+async def search_consoles(client, cache, console_list, cache_ttl, state=None):
+    """searches every console, updating `state` with the newest upload time seen when running incrementally"""
+    torrent_data = {}
+    for console in console_list:
+        if state is None:
+            await search_console(client, cache, cache_ttl, console, torrent_data)
+            continue
+        # an empty string sorts before any upload time, so a console's first incremental run is a full one
+        since = state.get(console, "")
+        state[console] = await search_console(client, cache, cache_ttl, console, torrent_data, since=since)
+    return torrent_data
+
+
+async def download_torrents(client, archive, torrent_data, args):
+    """downloads the picked torrents, returns whether every download succeeded"""
+    write_location = args.write_location
+    downloads = []
+    for (group_id, torrent) in torrent_data.items():
+        filename = f"{group_id}.torrent"
+        # a stat is far cheaper than a request, so skip torrents a previous run already wrote
+        if archive is None and not args.force and os.path.exists(os.path.join(write_location, filename)):
+            print(f"{filename} already exists, skipping.")
+            continue
+        downloads.append((torrent, filename))
+
+    # a dry run only prints links, which never waits on the network once the user info is known
+    if args.dry:
+        for (torrent, _) in downloads:
+            await client.download_torrent(torrent.torrent_id, dry=True)
+        return True
+
+    # the client bounds the number of downloads in flight to stay polite towards the tracker
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(download_one(client, torrent, write_location, filename, archive))
+            for (torrent, filename) in downloads
+        ]
+    return all(task.result() for task in tasks)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("downloader")
+    parser.add_argument("--token",
+                        help="GGN token to use for downloading torrents. Overrides the environment variable "
+                             "`GGN_TOKEN` which may also be used to set the to",
+                        default=None, required=False)
+    parser.add_argument("--dry",
+                        help="When dry is true, torrents will not be downloaded. Instead, their links will be printed.",
+                        action=argparse.BooleanOptionalAction, default=True, required=False)
+    parser.add_argument("--write_location", help="Location to write the torrent files to.", default="./",
+                        required=False)
+    parser.add_argument("--concurrency", help="Maximum number of torrents downloaded at the same time.", type=int,
+                        default=8, required=False)
+    parser.add_argument("--cache_ttl",
+                        help="Seconds search results are cached for between runs. Set to 0 to disable the cache.",
+                        type=int, default=600, required=False)
+    parser.add_argument("--archive",
+                        help="Path of a tar file to stream the downloaded torrents into instead of writing one file "
+                             "each.",
+                        default=None, required=False)
+    parser.add_argument("--force", help="Download torrents even if their file already exists in the write location.",
+                        action="store_true", required=False)
+    parser.add_argument("--incremental",
+                        help="Only look at torrents uploaded since the last incremental run, newest first.",
+                        action="store_true", required=False)
+    return parser.parse_args()
+
+
+async def main():
+    print("Starting GGN Console Downloader")
+
+    args = parse_args()
+
+    token = args.token if args.token is not None else os.getenv("GGN_TOKEN")
+
+    print(f"building client.")
+
+    # snatched flags in the search results are per user, so every token gets a cache directory of its own.
+    cache = diskcache.Cache(
+        os.path.join(CACHE_DIRECTORY, hashlib.sha256(str(token).encode()).hexdigest()[:16]),
+    ) if args.cache_ttl > 0 else None
+    # a dry run downloads nothing, opening the archive would only truncate it.
+    archive = tarfile.open(args.archive, "w|") if args.archive is not None and not args.dry else None
+    state = load_state() if args.incremental else None
+
+    try:
+        async with AsyncGGNClient(token, max_concurrency=args.concurrency) as client:
+            print(f"searching for torrents in {CONSOLE_LIST}")
+
+            torrent_data = await search_consoles(client, cache, CONSOLE_LIST, args.cache_ttl, state)
+
+            print(f"Found {len(torrent_data)} torrents.")
+
+            downloaded = await download_torrents(client, archive, torrent_data, args)
+
+        # only remember how far we got once the torrents were actually downloaded, a failed download is retried by
+        # the next incremental run.
+        if state is not None and not args.dry:
+            if downloaded:
+                save_state(state)
+            else:
+                print("Some torrents failed to download, the incremental state was not updated.")
+    finally:
+        if archive is not None:
+            archive.close()
+        if cache is not None:
+            cache.close()
+
+    print("Download complete.")
+
 
-print("Download complete.")
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,22 +1,210 @@
-from datetime import timedelta
-from ratelimit import limits, sleep_and_retry
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import diskcache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from dataclasses import dataclass, field
+from json import dumps as _dumps
 from typing import Dict
-
-
-@dataclass
+from urllib.parse import urlencode
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # orjson is only faster, the standard library parser gives the same result
+    from json import loads as _loads
+
+# size of the chunks torrent files are streamed to disk in.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# the api allows bursts of up to 5 calls, refilled at one call every 2 seconds.
+RATE_LIMIT_CAPACITY = 5.0
+RATE_LIMIT_REFILL_PER_SECOND = 0.5
+# how often a call throttled (429) or failed by the server (5xx) is retried. waits grow exponentially from
+# RETRY_BACKOFF_FACTOR seconds unless the server asks for a specific wait with Retry-After.
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# how many results of read only calls a client keeps at most.
+CACHE_MAXSIZE = 512
+# answers with more json than this many bytes are kept compressed in the cache, they shrink several times over and
+# unpacking them is still far quicker than calling the api again.
+CACHE_COMPRESS_MIN = 16 * 1024
+# how many bytes the disk cache clients share through `cache_dir` may take up.
+DISK_CACHE_SIZE_LIMIT = 128 * 1024 * 1024
+# how many seconds the results of an api request stay cached, requests not listed use the client's `cache_ttl`.
+CACHE_TTLS = {
+    "site_stats": 60,
+    "torrent_stats": 60,
+    "economic_stats": 60,
+    # wiki articles and collections hardly ever change.
+    "wiki": 86400,
+    "collection": 86400,
+    "forums": 60,
+    "item_stats": 30,
+    "store": 30,
+    "items": 30,
+}
+# how many seconds past their ttl these results are still answered right away while a fresh one is fetched in the
+# background.
+STALE_TTLS = {
+    "site_stats": 600,
+    "torrent_stats": 600,
+    "economic_stats": 600,
+}
+# how many ids the batch methods ask the api about in a single call.
+BATCH_SIZE = 50
+# the user info download_torrent needs is refetched in the background after USER_FRESH_TTL seconds and waited for
+# after USER_STALE_TTL seconds. its keys are saved in USER_CACHE_DIRECTORY so later clients can start with them.
+USER_FRESH_TTL = 3600
+USER_STALE_TTL = 7 * 86400
+USER_CACHE_DIRECTORY = os.path.join(os.environ.get("XDG_CACHE_HOME", "~/.cache"), "ggn")
+# headers sent with every call next to the api key. search pages compress well, so ask for compressed answers in
+# every encoding urllib3 can decode.
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": requests.utils.DEFAULT_ACCEPT_ENCODING,
+    "Content-Type": "application/json",
+}
+
+
+# maps optional boolean arguments onto the 1/0 the api expects with a single lookup, use `_TRIBOOL.get(value, 0)`.
+# None leaves the argument out rather than sending 0. values equal to True, such as 1, give 1 and anything else gives 0.
+_TRIBOOL = {None: None, True: 1, False: 0}
+
+# values accepted by the arguments of inbox.
+_INBOX_TYPES = frozenset({"inbox", "sentbox", None})
+_INBOX_SORTS = frozenset({"unread", None})
+_INBOX_SEARCH_TYPES = frozenset({"subject", "message", "user", None})
+
+_log = logging.getLogger(__name__)
+
+# what `GGNClient.cache_info` reports, modelled on `functools.lru_cache`. `bytes_saved` counts the json bytes the
+# api did not have to send thanks to the cache.
+CacheInfo = namedtuple("CacheInfo", ("hits", "misses", "maxsize", "currsize", "bytes_saved"))
+
+# headers a server marks answers with, mapped to the headers that ask it whether a cached answer is still current.
+_VALIDATORS = (("ETag", "If-None-Match"), ("Last-Modified", "If-Modified-Since"))
+# answered by conditional calls when the cached answer is still current.
+_NOT_MODIFIED = object()
+
+# api requests that only read, identical calls of these running at the same time share a single trip to the api.
+_IDEMPOTENT_ACTIONS = frozenset({
+    "quick_user",
+    "user_ratio_stats",
+    "user",
+    "userlog",
+    "user_community_stats",
+    "search",
+    "master_group",
+    "torrent_group",
+    "torrent",
+    "collection",
+    "wiki",
+    "sitelog",
+    "store",
+    "forums",
+    "site_stats",
+    "torrent_stats",
+    "economic_stats",
+    "item_stats",
+})
+
+# keyword arguments of search_torrents and search_requests mapped to their api name and whether they are booleans.
+_SEARCH_FIELDS = {
+    "search_str": ("searchstr", False),
+    "group_name": ("groupname", False),
+    "artist_name": ("artistname", False),
+    "artist_check": ("artistcheck", False),
+    "year": ("year", False),
+    "remaster_title": ("remastertitle", False),
+    "remaster_year": ("remasteryear", False),
+    "release_title": ("releasetitle", False),
+    "release_group": ("releasegroup", False),
+    "file_list": ("filelist", False),
+    "size_small": ("sizesmall", False),
+    "size_large": ("sizelarge", False),
+    "user_rating": ("userrating", False),
+    "meta_rating": ("metarating", False),
+    "ign_rating": ("ignrating", False),
+    "gs_rating": ("gsrating", False),
+    "encoding": ("encoding", False),
+    "audio_format": ("audioformat", False),
+    "region": ("region", False),
+    "language": ("language", False),
+    "rating": ("rating", False),
+    "rating_strict": ("rating_strict", True),
+    "miscellaneous": ("miscellaneous", False),
+    "game_dox": ("gamedox", False),
+    "scene": ("scene", True),
+    "dupable": ("dupable", False),
+    "free_torrent": ("freetorrent", False),
+    "checked": ("checked", True),
+    "tag_list": ("taglist", False),
+    "tags_type": ("tags_type", True),
+    "hide_dead": ("hide_dead", True),
+    "empty_groups": ("emptygroups", False),
+    "filter_cat_1": ("filtercat[1]", True),
+    "filter_cat_2": ("filtercat[2]", True),
+    "filter_cat_3": ("filtercat[3]", True),
+    "filter_cat_4": ("filtercat[4]", True),
+    "order_by": ("order_by", False),
+    "order_way": ("order_way", False),
+    "page": ("page", False),
+}
+
+
+def _hash_upper(torrent_hash):
+    """returns a torrent hash in the upper case the api expects, hashes that already are are passed through as is"""
+    if not torrent_hash:
+        return None
+    return torrent_hash if torrent_hash.isupper() else torrent_hash.upper()
+
+
+def _args(**kwargs) -> Dict[str, str]:
+    """builds the arguments of an api request, arguments set to None are left out"""
+    return {name: value for (name, value) in kwargs.items() if value is not None}
+
+
+def _cached_answer(value, compressed: bool):
+    """returns an answer kept in the cache, unpacking it when it was kept compressed. answers are kept as their json
+        and parsed on every hit, so callers get objects of their own they are free to change.
+    """
+    return _loads(zlib.decompress(value) if compressed else value)["response"]
+
+
+def _disk_key(key) -> str:
+    """returns a short, file system friendly key of a cached answer for the disk cache"""
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def _merge_batches(responses):
+    """joins the answers of the calls a batch method was split into, an empty batch gives an empty answer"""
+    merged = None
+    for response in responses:
+        if merged is None:
+            # answers may be cached, so they are copied instead of merged into.
+            merged = dict(response) if isinstance(response, dict) else list(response)
+        elif isinstance(merged, dict):
+            merged.update(response)
+        else:
+            merged.extend(response)
+    return {} if merged is None else merged
+
+
+@dataclass(slots=True)
 class Headers:
     token: str
     extra_headers: Dict[str, str] = field(default_factory=dict)
 
     def to_dict(self):
-        default_headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-API-Key": self.token,
-        }
-        return {**default_headers, **self.extra_headers}
+        return {**DEFAULT_HEADERS, "X-API-Key": self.token, **self.extra_headers}
 
     def add_header(self, key: str, value: str) -> None:
         """Adds a header to the extra headers."""
@@ -32,70 +220,485 @@ class GGNClientException(Exception):
 
 
 class GGNClient:
+    __slots__ = (
+        "_token",
+        "_base_url",
+        "_user",
+        "_user_lock",
+        "_user_refreshing",
+        "_user_file",
+        "_tokens",
+        "_last_refill",
+        "_rate_lock",
+        "_cache_ttl",
+        "_cache",
+        "_cache_lock",
+        "_refreshing",
+        "_disk_cache",
+        "_hits",
+        "_misses",
+        "_bytes_saved",
+        "_executor",
+        "_inflight",
+        "_inflight_lock",
+        "_session",
+        "_headers",
+    )
 
     def __init__(
             self,
             token=None,
             base_url: str = "https://gazellegames.net/api.php",
+            max_connections: int = 10,
+            cache_ttl: float = 300,
+            session: requests.Session = None,
+            cache_dir: str = None,
     ) -> None:
         self._token = token
         self._base_url = base_url
-        self._user = None # user info cache, needed for downloading torrents.
-
-    def __base_url(self):
-        return f"{self._base_url}?"
-
-    def _action_url(self, action: str = None, args: Dict[str, str] = None, override_url: str = None, ) -> str:
-        base = self.__base_url() if not override_url else override_url
-
-        if not action:
-            return base
-
-        extra_args = "&{}".format(
-            '&'.join([f"{key}={value}" for key, value in args.items() if value is not None]),
-        ) if args is not None and len(args) > 0 else ""
-
-        action_kind = "request" if action != "download" else "action"
-        return f"{base}&{action_kind}={action}{extra_args}"
-
-    @sleep_and_retry
-    @limits(calls=1, period=timedelta(seconds=2).total_seconds())
-    def _do_request(self, action: str, args: Dict[str, str] = None, override_url: str = None, dry: bool = False):
-        endpoint = self._action_url(
+        self._user = None # (fetched at, user info) cache, needed for downloading torrents.
+        self._user_lock = threading.Lock()
+        self._user_refreshing = False
+        # named after a hash of the api key, so several accounts never share keys.
+        self._user_file = os.path.join(
+            os.path.expanduser(USER_CACHE_DIRECTORY),
+            hashlib.sha256(token.encode()).hexdigest()[:16] + ".json",
+        ) if token else None
+        # token bucket pacing calls to the api, shared by every thread using the client.
+        self._tokens = RATE_LIMIT_CAPACITY
+        self._last_refill = time.monotonic()
+        self._rate_lock = threading.Lock()
+        # results of read only calls, see `_cached_request`.
+        self._cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+        # results shared with every other client, in any process, using the same `cache_dir`, api key and api. answers
+        # can be about the user of the api key, so each account and api gets a directory of its own.
+        self._disk_cache = diskcache.Cache(
+            os.path.join(
+                os.path.expanduser(cache_dir),
+                hashlib.sha256("{}\n{}".format(token, base_url).encode()).hexdigest()[:16],
+            ),
+            size_limit=DISK_CACHE_SIZE_LIMIT,
+        ) if cache_dir else None
+        # keys of stale results being refetched, and the threads refetching them.
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        # calls currently waiting on the api, see `_do_request`.
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # a single session keeps the connection to the tracker alive between calls. a session passed in is used as
+        # is, so callers can bring their own transport, such as an adapter speaking http/2. the client closes it.
+        self._session = session if session is not None else self._build_session(max_connections)
+        # the headers never change, so they are built once and set on the session instead of for every call.
+        self._headers = Headers(token=token).to_dict()
+        self._session.headers.update(self._headers)
+
+    @staticmethod
+    def _build_session(max_connections: int) -> requests.Session:
+        """builds the session calls are sent through when none is passed in"""
+        session = requests.Session()
+        # every call goes to the same host, so keep one pool sized to the number of concurrent callers. blocking
+        # on the pool makes extra callers wait for a kept-alive connection instead of opening throwaway ones.
+        # throttled and failed calls are retried by urllib3 on the same connection, the last answer is handed back
+        # as is so `_send` can report it.
+        retry = Retry(
+            total=RETRY_TOTAL,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True, max_retries=retry)
+        # plain http is mounted too, so a `base_url` without tls gets the same pooling and retries.
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """closes the underlying http session"""
+        self._executor.shutdown(cancel_futures=True)
+        self._session.close()
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+
+    def clear_cache(self) -> None:
+        """forgets every cached result of the read only calls and resets the statistics of `cache_info`"""
+        self.invalidate()
+        with self._cache_lock:
+            self._hits = self._misses = self._bytes_saved = 0
+
+    @property
+    def cache_info(self) -> CacheInfo:
+        """statistics of the cache of the read only calls"""
+        with self._cache_lock:
+            return CacheInfo(self._hits, self._misses, CACHE_MAXSIZE, len(self._cache), self._bytes_saved)
+
+    def invalidate(self, action: str = None) -> None:
+        """forgets the cached results of an api request
+            `action` - the api request to forget, every cached result is forgotten when not set
+        """
+        with self._cache_lock:
+            if action is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == action]:
+                    del self._cache[key]
+        if self._disk_cache is not None:
+            if action is None:
+                self._disk_cache.clear()
+            else:
+                self._disk_cache.evict(action)
+
+    def _do_request(
+            self,
+            action: str = None,
+            args: Dict[str, str] = None,
+            override_url: str = None,
+            dry: bool = False,
+            stream: bool = False,
+            headers: Dict[str, str] = None,
+            conditional: bool = False,
+    ):
+        """calls the api and returns the `response` member of its json answer
+            `action` - the api request to call
+            `args` - the arguments of the request, see `_args`
+            `override_url` - a url to call instead of the api
+            `dry` - return the url that would be called instead of calling it
+            `stream` - leave the body of non json responses unread. the requests response is returned as is and the
+                       caller reads it with `iter_content` and closes it, so binary payloads such as torrent files
+                       never have to be held in memory at once.
+            `headers` - headers to send with this call only
+            `conditional` - return the answer together with the headers to revalidate it with later and its json
+                            body, as a tuple. the answer is `_NOT_MODIFIED` when `headers` validated a cached answer.
+        """
+        url = override_url if override_url else self._base_url
+        params = {}
+        if action:
+            params["request" if action != "download" else "action"] = action
+        # requests takes care of the url encoding.
+        if args:
+            params.update(args)
+
+        # dry runs never reach the tracker, so they are answered before the rate limit.
+        if dry:
+            return f"{url}?{urlencode(params, doseq=True)}"
+
+        if stream or action not in _IDEMPOTENT_ACTIONS:
+            answer = self._send(action, url, params, stream=stream, headers=headers)
+            return answer if conditional else answer[0]
+
+        # the first caller makes the call, callers asking for the same thing meanwhile wait for its answer instead
+        # of spending another token on it. values are keyed by how they end up in the url.
+        key = (
+            url,
+            frozenset((name, str(value)) for (name, value) in params.items()),
+            frozenset(headers.items()) if headers else None,
+        )
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result() if conditional else future.result()[0]
+
+        try:
+            future.set_result(self._send(action, url, params, headers=headers))
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result() if conditional else future.result()[0]
+
+    def _cached_request(self, action: str = None, args: Dict[str, str] = None):
+        """calls `_do_request` for a read only request, answers are reused for the ttl of their action"""
+        if self._cache_ttl <= 0:
+            return self._do_request(action=action, args=args)
+
+        key = (action, tuple(sorted((name, str(value)) for (name, value) in (args or {}).items())))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            now = time.monotonic()
+            hit = cached is not None and cached[1] > now
+            if hit:
+                if cached[0] > now:
+                    self._cache.move_to_end(key)
+                elif key not in self._refreshing:
+                    # answer with the stale result and fetch a fresh one in the background, once. a closed client
+                    # still answers with it, it just no longer refreshes.
+                    self._refreshing.add(key)
+                    try:
+                        self._executor.submit(self._refresh, key, action, args, cached)
+                    except RuntimeError:
+                        self._refreshing.discard(key)
+        if not hit and self._disk_cache is not None:
+            # another client may have fetched it already.
+            disk_cached = self._load_disk(key, action)
+            if disk_cached is not None:
+                (cached, hit) = (disk_cached, True)
+
+        (_, _, value, _, size, compressed) = cached if hit else (None,) * 6
+        with self._cache_lock:
+            if hit:
+                self._hits += 1
+                self._bytes_saved += size
+            else:
+                self._misses += 1
+        if hit:
+            _log.debug("cache HIT action=%s key=%s", action, key)
+            return _cached_answer(value, compressed)
+        _log.debug("cache MISS action=%s key=%s", action, key)
+        return self._fetch(key, action, args, cached)
+
+    def _load_disk(self, key, action: str):
+        """copies an answer from the disk cache into the memory cache, returns its cache entry or None"""
+        (entry, expire_time) = self._disk_cache.get(_disk_key(key), expire_time=True)
+        if entry is None:
+            return None
+        (value, validators, size, compressed) = entry
+        ttl = expire_time - time.time() if expire_time is not None else None
+        return self._store(key, action, value, validators, size, compressed, ttl=ttl)
+
+    def _fetch(self, key, action: str, args: Dict[str, str], cached=None):
+        """calls a read only request and caches its answer. an expired answer the server marked is revalidated
+            instead, so the server only sends the answer again when it changed.
+        """
+        (response, validators, content) = self._do_request(
             action=action,
             args=args,
-            override_url=override_url,
+            headers=cached[3] if cached is not None else None,
+            conditional=True,
         )
+        if response is _NOT_MODIFIED:
+            (value, validators, size, compressed) = cached[2:]
+            with self._cache_lock:
+                self._bytes_saved += size
+            response = _cached_answer(value, compressed)
+        elif content is None:
+            # only json answers are cached.
+            return response
+        else:
+            size = len(content)
+            compressed = size > CACHE_COMPRESS_MIN
+            value = zlib.compress(content, 1) if compressed else content
+
+        self._store(key, action, value, validators, size, compressed)
+        if self._disk_cache is not None:
+            self._disk_cache.set(
+                _disk_key(key),
+                (value, validators, size, compressed),
+                expire=CACHE_TTLS.get(action, self._cache_ttl),
+                tag=action,
+            )
+        return response
 
-        if dry:
-            return endpoint
+    def _refresh(self, key, action: str, args: Dict[str, str], cached) -> None:
+        """refetches a stale result of `_cached_request` in the background"""
+        try:
+            self._fetch(key, action, args, cached)
+        finally:
+            with self._cache_lock:
+                self._refreshing.discard(key)
 
-        response = requests.get(
-            url=endpoint,
-            headers=Headers(token=self._token).to_dict(),
+    def _store(
+            self,
+            key,
+            action: str,
+            value,
+            validators: Dict[str, str],
+            size: int,
+            compressed: bool,
+            ttl: float = None,
+    ):
+        """caches the result of a read only request for `ttl` seconds or the ttl of its action, see `_cached_answer`.
+            returns the cache entry.
+        """
+        expires = time.monotonic() + (ttl if ttl is not None else CACHE_TTLS.get(action, self._cache_ttl))
+        entry = (expires, expires + STALE_TTLS.get(action, 0), value, validators, size, compressed)
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            if len(self._cache) > CACHE_MAXSIZE:
+                # the least recently used entry is evicted first.
+                self._cache.popitem(last=False)
+        return entry
+
+    def _get_user(self):
+        """returns the user info download_torrent needs, refetching it in the background once it gets old"""
+        with self._user_lock:
+            if self._user is None:
+                self._user = self._load_user()
+            age = time.monotonic() - self._user[0] if self._user is not None else USER_STALE_TTL
+            if age >= USER_STALE_TTL:
+                # the lock keeps concurrent downloads from all fetching it at once.
+                self._user = (time.monotonic(), self.quick_user())
+                self._save_user(self._user[1])
+            elif age >= USER_FRESH_TTL and not self._user_refreshing:
+                self._user_refreshing = True
+                try:
+                    self._executor.submit(self._refresh_user)
+                except RuntimeError:
+                    # the client is closed, the keys it has are still good for the downloads in flight.
+                    self._user_refreshing = False
+            return self._user[1]
+
+    def _refresh_user(self) -> None:
+        """refetches the user info of `_get_user` in the background"""
+        try:
+            user = self.quick_user()
+            with self._user_lock:
+                self._user = (time.monotonic(), user)
+            self._save_user(user)
+        finally:
+            with self._user_lock:
+                self._user_refreshing = False
+
+    def _load_user(self):
+        """reads the keys saved by an earlier client with the same api key as a (fetched at, user info) pair"""
+        if self._user_file is None:
+            return None
+        try:
+            with open(self._user_file, "rb") as user_file:
+                saved = _loads(user_file.read())
+            user = {"authkey": saved["authkey"], "passkey": saved["passkey"]}
+            # the file keeps wall clock time, the client measures ages on the monotonic clock.
+            return (time.monotonic() - (time.time() - saved["fetched_at"]), user)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _save_user(self, user) -> None:
+        """saves the keys download_torrent needs for later clients with the same api key"""
+        if self._user_file is None:
+            return
+        directory = os.path.dirname(self._user_file)
+        user_file = None
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # the temporary file is only readable by the owner and replaces the old one in a single step.
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".part", delete=False) as user_file:
+                user_file.write(_dumps({
+                    "authkey": user["authkey"],
+                    "passkey": user["passkey"],
+                    "fetched_at": time.time(),
+                }))
+            os.replace(user_file.name, self._user_file)
+        except OSError:
+            # the saved keys only spare a call, the client works without them. the temporary file holds the keys as
+            # well, so it is not left behind.
+            if user_file is not None:
+                try:
+                    os.unlink(user_file.name)
+                except OSError:
+                    pass
+
+    def _iter_pages(self, method, entries, limit: int, **kwargs):
+        """yields the pages of a paginated method until one comes back empty or short, always fetching the next page
+            in the background while the current one is used
+            `entries` - returns the list of results held by a page, pages are counted by it rather than by their size
+
+            a page that is already being fetched when the iteration is abandoned is still fetched, spending a call of
+            the rate limit for nothing.
+        """
+        # a worker of its own keeps the prefetching from queueing behind, or holding up, the background refreshes.
+        executor = ThreadPoolExecutor(max_workers=1)
+        page = 1
+        future = executor.submit(method, page=page, limit=limit, **kwargs)
+        try:
+            while True:
+                response = future.result()
+                if not response or not entries(response):
+                    return
+                # a short page is the last one, there is no need to ask for the empty one after it.
+                more = len(entries(response)) >= limit
+                if more:
+                    page += 1
+                    future = executor.submit(method, page=page, limit=limit, **kwargs)
+                yield response
+                if not more:
+                    return
+        finally:
+            future.cancel()
+            executor.shutdown(wait=False)
+
+    def _take_token(self) -> None:
+        """blocks until the token bucket allows another call to the api"""
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(
+                RATE_LIMIT_CAPACITY,
+                self._tokens + (now - self._last_refill) * RATE_LIMIT_REFILL_PER_SECOND,
+            )
+            self._last_refill = now
+            if self._tokens < 1:
+                # sleeping while holding the lock makes other callers queue up behind this one.
+                time.sleep((1 - self._tokens) / RATE_LIMIT_REFILL_PER_SECOND)
+                self._tokens = 0
+                self._last_refill = time.monotonic()
+            else:
+                self._tokens -= 1
+
+    def _send(
+            self,
+            action: str,
+            url: str,
+            params: Dict[str, str],
+            stream: bool = False,
+            headers: Dict[str, str] = None,
+    ):
+        """makes a call and returns its answer together with the headers to revalidate the answer with and its json
+            body
+        """
+        self._take_token()
+        response = self._session.get(
+            url=url,
+            params=params,
+            headers=headers,
             timeout=10,
+            stream=stream,
         )
-
-        if not response.ok:
+        status_code = response.status_code
+        if status_code == 304:
+            return (_NOT_MODIFIED, None, None)
+        if status_code >= 400:
             raise GGNClientException(
-                f"Failed to call {action}: {response.status_code} - {response.text}"
+                f"Failed to call {action}: {status_code} - {response.text}"
             )
-        if response.headers.get("Content-Type") != "application/json":
-            return response
+        # the header may carry a charset after the media type.
+        if not response.headers.get("Content-Type", "").startswith("application/json"):
+            return (response, None, None)
 
-        json = response.json()
+        content = response.content
+        json = _loads(content)
         if json["status"] != "success":
             raise GGNClientException(
                 f"Failed to call {action}: {json}"
             )
-        return json["response"]
+        validators = {
+            request_header: response.headers[response_header]
+            for (response_header, request_header) in _VALIDATORS
+            if response_header in response.headers
+        }
+        return (json["response"], validators or None, content)
 
     def index(self):
         """returns the ggn api version
 
            Required Permissions: None
         """
-        response = self._do_request()
+        response = self._cached_request()
 
         return response
 
@@ -133,10 +736,10 @@ class GGNClient:
         if user_id and name:
             raise GGNClientException("only one of id or name can be provided")
 
-        response = self._do_request(action="user", args={
-            "id": user_id if user_id else None,
-            "username": name if name else None,
-        })
+        response = self._cached_request(action="user", args=_args(
+            id=user_id if user_id else None,
+            username=name if name else None,
+        ))
 
         return response
 
@@ -148,11 +751,11 @@ class GGNClient:
 
            Required Permissions: User
         """
-        response = self._do_request(action="userlog", args={
-            "search": search,
-            "page": page,
-            "limit": limit,
-        })
+        response = self._do_request(action="userlog", args=_args(
+            search=search,
+            page=page,
+            limit=limit,
+        ))
 
         return response
 
@@ -162,9 +765,9 @@ class GGNClient:
 
            Required Permissions: None(?)
         """
-        response = self._do_request(action="user_community_stats", args={
-            "userid": user_id,
-        })
+        response = self._cached_request(action="user_community_stats", args=_args(
+            userid=user_id,
+        ))
 
         return response
 
@@ -185,20 +788,20 @@ class GGNClient:
 
            Required Permissions: User
         """
-        if message_type not in ["inbox", "sentbox", None]:
+        if message_type not in _INBOX_TYPES:
             raise GGNClientException("type must be 'inbox' or 'sentbox', or None")
-        if sort not in ["unread", None]:
+        if sort not in _INBOX_SORTS:
             raise GGNClientException("sort must be 'unread' or None")
-        if search_type not in ["subject", "message", "user", None]:
+        if search_type not in _INBOX_SEARCH_TYPES:
             raise GGNClientException("searchtype must be 'subject', 'message', or 'user', or None")
 
-        response = self._do_request(action="inbox", args={
-            "type": message_type,
-            "page": page,
-            "sort": sort,
-            "search": search,
-            "searchtype": search_type,
-        })
+        response = self._do_request(action="inbox", args=_args(
+            type=message_type,
+            page=page,
+            sort=sort,
+            search=search,
+            searchtype=search_type,
+        ))
 
         return response
 
@@ -208,10 +811,10 @@ class GGNClient:
 
            Required Permissions: User
         """
-        response = self._do_request(action="inbox", args={
-            "type": "viewconv",
-            "id": conv_id
-        })
+        response = self._do_request(action="inbox", args=_args(
+            type="viewconv",
+            id=conv_id
+        ))
 
         return response
 
@@ -224,13 +827,13 @@ class GGNClient:
 
            Required Permissions: User
         """
-        response = self._do_request(action="inbox", args={
-            "type": "send",
-            "to": to,
-            "subject": subject,
-            "body": body,
-            "convid": conv_id,
-        })
+        response = self._do_request(action="inbox", args=_args(
+            type="send",
+            to=to,
+            subject=subject,
+            body=body,
+            convid=conv_id,
+        ))
 
         return response
 
@@ -240,55 +843,31 @@ class GGNClient:
 
            Required Permissions: User
         """
-        response = self._do_request(action="inbox", args={
-            "type": "markread",
-            "messages": messages,
-        })
+        response = self._do_request(action="inbox", args=_args(
+            type="markread",
+            messages=",".join(map(str, messages)) if messages else None,
+        ))
 
         return response
 
-    def search_torrents(
-            self,
-            search_str: str = None,
-            group_name: str = None,
-            artist_name: str = None,
-            artist_check: str = None,
-            year: int = None,
-            remaster_title: str = None,
-            remaster_year: int = None,
-            release_title: str = None,
-            release_group: str = None,
-            file_list: str = None,
-            size_small: int = None,
-            size_large: int = None,
-            user_rating: int = None,
-            meta_rating: int = None,
-            ign_rating: int = None,
-            gs_rating: int = None,
-            encoding: str = None,
-            audio_format: str = None,  # format
-            region: str = None,
-            language: str = None,
-            rating: str = None,
-            rating_strict: bool = None,
-            miscellaneous: str = None,
-            game_dox: str = None,
-            scene: bool = None,
-            dupable: int = None,
-            free_torrent: int = None,
-            checked: bool = None,
-            tag_list: [str] = None,
-            tags_type: bool = None,
-            hide_dead: bool = None,
-            empty_groups: str = None,
-            filter_cat_1: bool = None,
-            filter_cat_2: bool = None,
-            filter_cat_3: bool = None,
-            filter_cat_4: bool = None,
-            order_by: str = None,
-            order_way: str = None,
-            page: int = 1,
-    ):
+    @staticmethod
+    def _build_search_args(search_type: str, **kwargs) -> Dict[str, str]:
+        """maps the keyword arguments of the search methods onto the api's argument names"""
+        args = {"search_type": search_type, "page": 1}
+        for (name, value) in kwargs.items():
+            try:
+                (api_name, boolean) = _SEARCH_FIELDS[name]
+            except KeyError:
+                raise GGNClientException(f"unknown search argument {name}") from None
+            if value is not None:
+                args[api_name] = _TRIBOOL.get(value, 0) if boolean else value
+        # the api takes tags as one comma separated string, lists of tags are joined here.
+        tag_list = args.get("taglist")
+        if tag_list is not None and not isinstance(tag_list, str):
+            args["taglist"] = ",".join(tag_list)
+        return args
+
+    def search_torrents(self, **kwargs):
         """searches for torrents
 
             All arguments are optional.
@@ -333,93 +912,10 @@ class GGNClient:
             `order_way` - Sort order direction: asc or desc. (default desc)
 
         Required Permissions: None"""
+        response = self._do_request(action="search", args=self._build_search_args("torrents", **kwargs))
+        return response
 
-        response = self._do_request(action="search", args={
-            "search_type": "torrents",
-            "searchstr": search_str,
-            "groupname": group_name,
-            "artistname": artist_name,
-            "artistcheck": artist_check,
-            "year": year,
-            "remastertitle": remaster_title,
-            "releasegroup": release_group,
-            "remasteryear": remaster_year,
-            "releasetitle": release_title,
-            "filelist": file_list,
-            "sizesmall": size_small,
-            "sizelarge": size_large,
-            "userrating": user_rating,
-            "metarating": meta_rating,
-            "ignrating": ign_rating,
-            "gsrating": gs_rating,
-            "encoding": encoding,
-            "audioformat": audio_format,
-            "region": region,
-            "language": language,
-            "rating": rating,
-            "rating_strict": rating_strict,
-            "miscellaneous": miscellaneous,
-            "gamedox": game_dox,
-            "scene": scene,
-            "dupable": dupable,
-            "freetorrent": free_torrent,
-            "checked": int(checked is True) if checked is not None else None,
-            "taglist": tag_list,
-            "tags_type": int(tags_type is True) if tags_type is not None else None,
-            "hide_dead": int(hide_dead is True) if hide_dead is not None else None,
-            "emptygroups": empty_groups,
-            "filtercat[1]": int(filter_cat_1 is True) if filter_cat_1 is not None else None,
-            "filtercat[2]": int(filter_cat_2 is True) if filter_cat_2 is not None else None,
-            "filtercat[3]": int(filter_cat_3 is True) if filter_cat_3 is not None else None,
-            "filtercat[4]": int(filter_cat_4 is True) if filter_cat_4 is not None else None,
-            "order_by": order_by,
-            "order_way": order_way,
-            "page": page,
-        })
-        return response
-
-    def search_requests(
-            self,
-            search_str: str = None,
-            group_name: str = None,
-            artist_name: str = None,
-            artist_check: str = None,
-            year: int = None,
-            remaster_title: str = None,
-            remaster_year: int = None,
-            release_title: str = None,
-            release_group: str = None,
-            file_list: str = None,
-            size_small: int = None,
-            size_large: int = None,
-            user_rating: int = None,
-            meta_rating: int = None,
-            ign_rating: int = None,
-            gs_rating: int = None,
-            encoding: str = None,
-            audio_format: str = None,  # format
-            region: str = None,
-            language: str = None,
-            rating: str = None,
-            rating_strict: bool = None,
-            miscellaneous: str = None,
-            game_dox: str = None,
-            scene: bool = None,
-            dupable: int = None,
-            free_torrent: int = None,
-            checked: bool = None,
-            tag_list: [str] = None,
-            tags_type: bool = None,
-            hide_dead: bool = None,
-            empty_groups: str = None,
-            filter_cat_1: bool = None,
-            filter_cat_2: bool = None,
-            filter_cat_3: bool = None,
-            filter_cat_4: bool = None,
-            order_by: str = None,
-            order_way: str = None,
-            page: int = 1,
-    ):
+    def search_requests(self, **kwargs):
         """searches for requests
 
            All arguments are optional.
@@ -465,48 +961,7 @@ class GGNClient:
 
         Required Permissions: None
         """
-        response = self._do_request(action="search", args={
-            "search_type": "requests",
-            "searchstr": search_str,
-            "groupname": group_name,
-            "artistname": artist_name,
-            "artistcheck": artist_check,
-            "year": year,
-            "remastertitle": remaster_title,
-            "releasegroup": release_group,
-            "remasteryear": remaster_year,
-            "releasetitle": release_title,
-            "filelist": file_list,
-            "sizesmall": size_small,
-            "sizelarge": size_large,
-            "userrating": user_rating,
-            "metarating": meta_rating,
-            "ignrating": ign_rating,
-            "gsrating": gs_rating,
-            "encoding": encoding,
-            "audioformat": audio_format,
-            "region": region,
-            "language": language,
-            "rating": rating,
-            "rating_strict": rating_strict,
-            "miscellaneous": miscellaneous,
-            "gamedox": game_dox,
-            "scene": scene,
-            "dupable": dupable,
-            "freetorrent": free_torrent,
-            "checked": int(checked is True) if checked is not None else None,
-            "taglist": tag_list,
-            "tags_type": int(tags_type is True) if tags_type is not None else None,
-            "hide_dead": int(hide_dead is True) if hide_dead is not None else None,
-            "emptygroups": empty_groups,
-            "filtercat[1]": int(filter_cat_1 is True) if filter_cat_1 is not None else None,
-            "filtercat[2]": int(filter_cat_2 is True) if filter_cat_2 is not None else None,
-            "filtercat[3]": int(filter_cat_3 is True) if filter_cat_3 is not None else None,
-            "filtercat[4]": int(filter_cat_4 is True) if filter_cat_4 is not None else None,
-            "order_by": order_by,
-            "order_way": order_way,
-            "page": page,
-        })
+        response = self._do_request(action="search", args=self._build_search_args("requests", **kwargs))
         return response
 
     def search_collections(
@@ -551,25 +1006,27 @@ class GGNClient:
 
            Required Permissions: None
         """
-        response = self._do_request(action="search", args={
-            "search": search,
-            "search_type": search_type,
-            "order": order,
-            "way": way,
-            "cats[1]": int(cats_1 is True) if cats_1 is not None else None,
-            "cats[2]": int(cats_2 is True) if cats_2 is not None else None,
-            "cats[3]": int(cats_3 is True) if cats_3 is not None else None,
-            "cats[4]": int(cats_4 is True) if cats_4 is not None else None,
-            "cats[5]": int(cats_5 is True) if cats_5 is not None else None,
-            "cats[6]": int(cats_6 is True) if cats_6 is not None else None,
-            "cats[7]": int(cats_7 is True) if cats_7 is not None else None,
-            "cats[8]": int(cats_8 is True) if cats_8 is not None else None,
-            "cats[9]": int(cats_9 is True) if cats_9 is not None else None,
-            "cats[10]": int(cats_10 is True) if cats_10 is not None else None,
-            "cats[11]": int(cats_11 is True) if cats_11 is not None else None,
-            "cats[12]": int(cats_12 is True) if cats_12 is not None else None,
-            "cats[15]": int(cats_15 is True) if cats_15 is not None else None,
-        })
+        response = self._do_request(action="search", args=_args(
+            search=search,
+            search_type=search_type,
+            order=order,
+            way=way,
+            **{
+                "cats[1]": _TRIBOOL.get(cats_1, 0),
+                "cats[2]": _TRIBOOL.get(cats_2, 0),
+                "cats[3]": _TRIBOOL.get(cats_3, 0),
+                "cats[4]": _TRIBOOL.get(cats_4, 0),
+                "cats[5]": _TRIBOOL.get(cats_5, 0),
+                "cats[6]": _TRIBOOL.get(cats_6, 0),
+                "cats[7]": _TRIBOOL.get(cats_7, 0),
+                "cats[8]": _TRIBOOL.get(cats_8, 0),
+                "cats[9]": _TRIBOOL.get(cats_9, 0),
+                "cats[10]": _TRIBOOL.get(cats_10, 0),
+                "cats[11]": _TRIBOOL.get(cats_11, 0),
+                "cats[12]": _TRIBOOL.get(cats_12, 0),
+                "cats[15]": _TRIBOOL.get(cats_15, 0),
+            },
+        ))
         return response
 
     def get_master_group(self, id: int, group_id: int):
@@ -579,10 +1036,10 @@ class GGNClient:
 
            Required Permissions: None
         """
-        response = self._do_request(action="master_group", args={
-            "id": id,
-            "groupid": group_id,
-        })
+        response = self._cached_request(action="master_group", args=_args(
+            id=id,
+            groupid=group_id,
+        ))
         return response
 
     def get_torrent_group(self, group_id: int, torrent_hash: str, name: str):
@@ -593,11 +1050,11 @@ class GGNClient:
 
            Required Permissions: None
         """
-        response = self._do_request(action="torrent_group", args={
-            "id": group_id,
-            "hash": torrent_hash.upper() if torrent_hash else None,
-            "name": name,
-        })
+        response = self._cached_request(action="torrent_group", args=_args(
+            id=group_id,
+            hash=_hash_upper(torrent_hash),
+            name=name,
+        ))
         return response
 
     def get_torrent(self, torrent_id: int, torrent_hash: str = None):
@@ -607,10 +1064,10 @@ class GGNClient:
 
            Required Permissions: None
         """
-        response = self._do_request(action="torrent", args={
-            "id": torrent_id,
-            "hash": torrent_hash.upper() if torrent_hash else None,
-        })
+        response = self._cached_request(action="torrent", args=_args(
+            id=torrent_id,
+            hash=_hash_upper(torrent_hash),
+        ))
 
         return response
 
@@ -629,12 +1086,12 @@ class GGNClient:
 
            Required Permissions: Torrents
         """
-        response = self._do_request(action="delete_notifs", args={
-            "limit": limit,
-            "page": page,
-            "clear": clear,
-            "mark_unread": int(mark_unread is True),
-        })
+        response = self._do_request(action="delete_notifs", args=_args(
+            limit=limit,
+            page=page,
+            clear=clear,
+            mark_unread=_TRIBOOL.get(mark_unread, 0),
+        ))
 
         return response
 
@@ -644,7 +1101,7 @@ class GGNClient:
 
             Required Permissions: None
         """
-        response = self._do_request(action="collection", args={"id": "{}".format(collection_id)})
+        response = self._cached_request(action="collection", args=_args(id="{}".format(collection_id)))
         return response
 
     def get_wiki_article(self, article_id: int):
@@ -653,7 +1110,7 @@ class GGNClient:
 
             Required Permissions: Wiki
         """
-        response = self._do_request(action="wiki", args={"id": "{}".format(article_id)})
+        response = self._cached_request(action="wiki", args=_args(id="{}".format(article_id)))
         return response
 
     def get_site_log(self, page: int = 1, limit: int = 25, search: str = None):
@@ -664,13 +1121,23 @@ class GGNClient:
 
             Required Permissions: Site Info
         """
-        response = self._do_request(action="sitelog", args={
-            "page": page,
-            "limit": limit,
-            "search": search,
-        })
+        response = self._do_request(action="sitelog", args=_args(
+            page=page,
+            limit=limit,
+            search=search,
+        ))
         return response
 
+    def iter_site_log(self, limit: int = 25, search: str = None):
+        """yields the pages of the site log one after the other, the next page is fetched while the current one is used
+            `limit` - the amount of results per page (default 25)
+            `search` - search for logs containing a string (case-insensitive)
+
+            Required Permissions: Site Info
+        """
+        # the site log answer is the list of log entries itself
+        return self._iter_pages(self.get_site_log, lambda page: page, limit=limit, search=search)
+
     def get_item_info(self, item_id: int = None, item_ids: [int] = None):
         """gets an item's info
             `item_id` - the id of the item (cannot be used with `item_ids`)
@@ -678,13 +1145,26 @@ class GGNClient:
 
             Required Permissions: Store
         """
+        if item_id is not None and item_ids is not None:
+            raise GGNClientException("only one of item_id or item_ids can be provided")
 
-        response = self._do_request(action="store", args={
-            "itemid": item_id,
-            "itemids": '[{}]'.format(','.join(map(str, item_ids))) if item_ids else None,
-        })
+        response = self._cached_request(action="store", args=_args(
+            itemid=item_id,
+            itemids='[{}]'.format(','.join(map(str, item_ids))) if item_ids else None,
+        ))
         return response
 
+    def get_item_info_batch(self, item_ids: [int]):
+        """gets the info of any number of items, asking the api about `BATCH_SIZE` of them per call
+            `item_ids` - a list of item ids
+
+            Required Permissions: Store
+        """
+        return _merge_batches(
+            self.get_item_info(item_ids=item_ids[start:start + BATCH_SIZE])
+            for start in range(0, len(item_ids), BATCH_SIZE)
+        )
+
     def search_items(
             self,
             search: str = None,
@@ -717,23 +1197,34 @@ class GGNClient:
 
             Requires Permissions: None?
         """
-        response = self._do_request(action="store", args={
-            "type": "search",
-            "search": search,
-            "search_more": int(search_more is True) if search_more is not None else None,
-            "category": category,
-            "item_type": item_type,
-            "cost_type": cost_type,
-            "cost_amount": cost_amount,
-            "in_stock": int(in_stock is True) if in_stock is not None else None,
-            "no_featured": int(no_featured is True) if no_featured is not None else None,
-            "order_by": order_by,
-            "order_way": order_way,
-            "page": page,
-            "limit": limit,
-        })
+        response = self._cached_request(action="store", args=_args(
+            type="search",
+            search=search,
+            search_more=_TRIBOOL.get(search_more, 0),
+            category=category,
+            item_type=item_type,
+            cost_type=cost_type,
+            cost_amount=cost_amount,
+            in_stock=_TRIBOOL.get(in_stock, 0),
+            no_featured=_TRIBOOL.get(no_featured, 0),
+            order_by=order_by,
+            order_way=order_way,
+            page=page,
+            limit=limit,
+        ))
         return response
 
+    def iter_search_items(self, limit: int = 30, **kwargs):
+        """yields the pages of an item search one after the other, the next page is fetched while the current one is
+            used
+            `limit` - the amount of results per page (default 30)
+            every other argument of `search_items` except `page` is taken as well.
+
+            Requires Permissions: None?
+        """
+        # an item search answer holds its results under "items" next to the paging details
+        return self._iter_pages(self.search_items, lambda page: page.get("items") or [], limit=limit, **kwargs)
+
     def get_user_items(self, user_id: int = None, include_info: bool = False):
         """gets a user's items
             `user_id` - id of the user to display. default: self
@@ -741,11 +1232,11 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "inventory",
-            "userid": user_id,
-            "include_info": include_info,
-        })
+        response = self._cached_request(action="items", args=_args(
+            type="inventory",
+            userid=user_id,
+            include_info=include_info,
+        ))
         return response
 
     def get_user_equipment(self, user_id: int = None, include_info: bool = False):
@@ -755,11 +1246,11 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "users_equippable",
-            "userid": user_id,
-            "include_info": include_info,
-        })
+        response = self._cached_request(action="items", args=_args(
+            type="users_equippable",
+            userid=user_id,
+            include_info=include_info,
+        ))
         return response
 
     def get_users_equipped(self, include_info: bool = False):
@@ -768,24 +1259,24 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "users_equipped",
-            "include_info": include_info,
-        })
+        response = self._cached_request(action="items", args=_args(
+            type="users_equipped",
+            include_info=include_info,
+        ))
         return response
 
     def get_user_buffs(self):
         """gets your own buffs
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={"type": "users_buffs"})
+        response = self._cached_request(action="items", args=_args(type="users_buffs"))
         return response
 
     def get_user_crafted_recipes(self):
         """gets your own crafted recipes
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={"type": "crafted_recipes"})
+        response = self._cached_request(action="items", args=_args(type="crafted_recipes"))
         return response
 
     def get_crafting_recipe(self, recipe_id: int = None, recipe_ids: [int] = None):
@@ -795,13 +1286,27 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "get_crafting_recipe",
-            "recipeid": recipe_id,
-            "recipeids": recipe_ids,
-        })
+        if recipe_id is not None and recipe_ids is not None:
+            raise GGNClientException("only one of recipe_id or recipe_ids can be provided")
+
+        response = self._cached_request(action="items", args=_args(
+            type="get_crafting_recipe",
+            recipeid=recipe_id,
+            recipeids='[{}]'.format(','.join(map(str, recipe_ids))) if recipe_ids else None,
+        ))
         return response
 
+    def get_crafting_recipe_batch(self, recipe_ids: [int]):
+        """gets any number of crafting recipes, asking the api about `BATCH_SIZE` of them per call
+            `recipe_ids` - a list of recipe ids to query (get this from the Users Crafted Recipes endpoint)
+
+            Required Permissions: Items
+        """
+        return _merge_batches(
+            self.get_crafting_recipe(recipe_ids=recipe_ids[start:start + BATCH_SIZE])
+            for start in range(0, len(recipe_ids), BATCH_SIZE)
+        )
+
     def get_crafting_result(self, action: str = "find", recipe_id: int = None, recipe: str = None):
         """gets the result of a crafting recipe
             `action` - `find` (default) or `take`. find will return the result if one exists, take will take the resulting crafting item if possible.
@@ -810,12 +1315,16 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "crafting_result",
-            "action": action,
-            "recipeid": recipe_id,
-            "recipe": recipe,
-        })
+        if recipe_id is not None and recipe is not None:
+            raise GGNClientException("only one of recipe_id or recipe can be provided")
+
+        response = self._do_request(action="items", args=_args(
+            type="crafting_result",
+            action=action,
+            recipeid=recipe_id,
+            recipe=recipe,
+        ))
+        self.invalidate("items")
         return response
 
     def purchase_item(self, item_id: int, amount: int):
@@ -824,11 +1333,12 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "purchase",
-            "itemid": item_id,
-            "amount": amount,
-        })
+        response = self._do_request(action="items", args=_args(
+            type="purchase",
+            itemid=item_id,
+            amount=amount,
+        ))
+        self.invalidate("items")
         return response
 
     def use_item(self, item_id: int, amount: int):
@@ -838,11 +1348,12 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "use",
-            "itemid": item_id,
-            "amount": amount,
-        })
+        response = self._do_request(action="items", args=_args(
+            type="use",
+            itemid=item_id,
+            amount=amount,
+        ))
+        self.invalidate("items")
         return response
 
     def unpack_item(self, item_id: int, amount: int):
@@ -852,11 +1363,12 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "unpack",
-            "itemid": item_id,
-            "amount": amount,
-        })
+        response = self._do_request(action="items", args=_args(
+            type="unpack",
+            itemid=item_id,
+            amount=amount,
+        ))
+        self.invalidate("items")
         return response
 
     def equip_item(self, equip_id: int):
@@ -865,24 +1377,29 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "equip",
-            "equipid": equip_id,
-        })
+        response = self._do_request(action="items", args=_args(
+            type="equip",
+            equipid=equip_id,
+        ))
+        self.invalidate("items")
         return response
 
-    def unequip_item(self, equip_id: int, slot_id: int):
+    def unequip_item(self, equip_id: int = None, slot_id: int = None):
         """unequips an item
             `equip_id` - The equip_id of the specific piece of equipment you want to unequip. You can obtain this from the Users Equipment endpoint. (cannot be used with `slot_id`)
             `slot_id` - The slot_id of the specific slot you want to unequip. You can obtain this from the Users Equipment endpoint. (cannot be used with `equip_id`)
 
             Required Permissions: Items
         """
-        response = self._do_request(action="items", args={
-            "type": "unequip",
-            "equipid": equip_id,
-            "slotid": slot_id,
-        })
+        if equip_id is not None and slot_id is not None:
+            raise GGNClientException("only one of equip_id or slot_id can be provided")
+
+        response = self._do_request(action="items", args=_args(
+            type="unequip",
+            equipid=equip_id,
+            slotid=slot_id,
+        ))
+        self.invalidate("items")
         return response
 
     def get_thread_info(self, thread_id: int):
@@ -891,10 +1408,10 @@ class GGNClient:
 
             Required Permissions: Forums
         """
-        response = self._do_request(action="forums", args={
-            "type": "thread_info",
-            "id": thread_id,
-        })
+        response = self._cached_request(action="forums", args=_args(
+            type="thread_info",
+            id=thread_id,
+        ))
         return response
 
     def get_site_stats(self):
@@ -902,7 +1419,7 @@ class GGNClient:
 
             Required Permissions: None
         """
-        response = self._do_request(action="site_stats")
+        response = self._cached_request(action="site_stats")
         return response
 
     def get_torrent_stats(self):
@@ -911,7 +1428,7 @@ class GGNClient:
             Required Permissions: Site Info
             Requires Legendary Gamer+
         """
-        response = self._do_request(action="torrent_stats")
+        response = self._cached_request(action="torrent_stats")
         return response
 
     def get_economic_stats(self):
@@ -920,7 +1437,7 @@ class GGNClient:
             Required Permissions: Site Info
             Requires Legendary Gamer+
         """
-        response = self._do_request(action="economic_stats")
+        response = self._cached_request(action="economic_stats")
         return response
 
     def get_item_stats(self, item_id: int):
@@ -929,42 +1446,79 @@ class GGNClient:
 
             Required Permissions: Items
         """
-        response = self._do_request(action="item_stats", args={
-            "itemid": "{}".format(item_id),
-        })
+        response = self._cached_request(action="item_stats", args=_args(
+            itemid="{}".format(item_id),
+        ))
         return response
 
-    def download_torrent(self, torrent_id: int, write_location: str = None, dry: bool = True):
+    def download_torrent(self, torrent_id: int, write_location: str = None, dry: bool = True, output=None):
         """downloads a torrent. This is not a standard part of the API, but is a useful function to have
             `torrent_id` - the id of the torrent
             `dry` - whether to simulate the download by just printing out the download link (default True)
             `write_location` - the location to save the torrent to
+            `output` - a binary file object to write the torrent to instead of `write_location`
 
             Requires Permissions: User
         """
-        if (dry is None or dry is False) and write_location is None:
-            raise Exception("write_location must be set if dry is False")
+        if (dry is None or dry is False) and write_location is None and output is None:
+            raise Exception("write_location or output must be set if dry is False")
 
         # cache user info so that we don't have to keep calling the API for every torrent download.
-        if self._user is None:
-            self._user = self.quick_user()
+        user = self._get_user()
 
         response = self._do_request(
             action="download",
-            override_url="https://gazellegames.net/torrents.php?",
+            override_url="https://gazellegames.net/torrents.php",
             dry=dry,
-            args={
-                "id": torrent_id,
-                "authkey": self._user["authkey"],
-                "torrent_pass": self._user["passkey"],
-            },
+            stream=True,
+            args=_args(
+                id=torrent_id,
+                authkey=user["authkey"],
+                torrent_pass=user["passkey"],
+            ),
         )
         if dry:
             print(response)
             return
 
-        torrent_file = open(write_location, "wb")
-        torrent_file.write(response.content)
-        torrent_file.close()
+        if output is not None:
+            with response:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    output.write(chunk)
+            return
+
+        # stream the body straight to disk instead of buffering the whole file in memory. it goes to a temporary file
+        # next to the target first, so a failed download never leaves a truncated torrent behind.
+        directory = os.path.dirname(write_location) or "."
+        with response, tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".part", delete=False) as torrent_file:
+            try:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    torrent_file.write(chunk)
+            except BaseException:
+                torrent_file.close()
+                os.unlink(torrent_file.name)
+                raise
+        os.replace(torrent_file.name, write_location)
         print("Torrent downloaded to {}".format(write_location))
 
+    def download_torrents(self, torrent_ids: [int], write_dir: str, concurrency: int = 8, dry: bool = True):
+        """downloads several torrents at once. This is not a standard part of the API, but is a useful function to have
+            `torrent_ids` - the ids of the torrents
+            `write_dir` - the directory to save the torrents to, each one is named after its id
+            `concurrency` - how many torrents are downloaded at the same time (default 8)
+            `dry` - whether to simulate the downloads by just printing out the download links (default True)
+
+            Requires Permissions: User
+        """
+        # the downloads only wait on the network, so threads sharing the session overlap them. the token bucket still
+        # paces them and the connection pool caps how many are open at once.
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # consuming the results raises the first failed download here.
+            list(executor.map(
+                lambda torrent_id: self.download_torrent(
+                    torrent_id,
+                    write_location=os.path.join(write_dir, "{}.torrent".format(torrent_id)),
+                    dry=dry,
+                ),
+                torrent_ids,
+            ))
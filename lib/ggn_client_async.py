@@ -0,0 +1,49 @@
+import asyncio
+import functools
+
+from lib.ggn_client import GGNClient
+
+
+class AsyncGGNClient:
+    """asyncio front end of GGNClient
+
+        every public method of GGNClient is available as a coroutine taking the same arguments. calls run in worker
+        threads so up to `max_concurrency` of them are in flight at once, while the wrapped client's session, token
+        bucket and caches are shared by all of them. attributes that are not methods, such as `cache_info`, are passed
+        through as is. the `iter_` methods are left out, their pages are fetched while iterating and would block the
+        event loop, await the page methods they walk instead.
+    """
+
+    def __init__(self, token=None, max_concurrency: int = 5, **kwargs) -> None:
+        self._client = GGNClient(token, max_connections=max_concurrency, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """closes the underlying http session"""
+        self._client.close()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name.startswith("iter_"):
+            raise AttributeError(f"{name} blocks while iterated, await the page method it walks instead")
+        method = getattr(self._client, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            async with self._semaphore:
+                return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+    async def gather(self, *calls):
+        """runs several calls at once, returns their results in the order the calls were given"""
+        return await asyncio.gather(*calls)
@@ -0,0 +1,86 @@
+from downloader import Pick, process_page
+
+
+def _torrent(group_id, title, time, seeders, snatched=False, torrent_type="Torrent", game_dox=""):
+    return {
+        "GroupID": group_id,
+        "ReleaseTitle": title,
+        "Time": time,
+        "Seeders": seeders,
+        "IsSnatched": snatched,
+        "TorrentType": torrent_type,
+        "GameDOXType": game_dox,
+    }
+
+
+def _page(*groups):
+    """builds a page of search results out of lists of (torrent id, torrent) pairs"""
+    return {str(index): {"Torrents": dict(torrents)} for (index, torrents) in enumerate(groups)}
+
+
+def test_picks_the_best_seeded_torrent_of_each_group():
+    page = _page(
+        [("10", _torrent(1, "a", "2020", 3)), ("11", _torrent(1, "b", "2020", 9)), ("12", _torrent(1, "c", "2020", 5))],
+        [("20", _torrent(2, "d", "2020", 1))],
+    )
+    torrent_data = {}
+    assert process_page(page, torrent_data) == (None, True)
+    assert torrent_data == {1: Pick("11", "b", 9), 2: Pick("20", "d", 1)}
+
+
+def test_first_torrent_wins_a_tie():
+    page = _page([("10", _torrent(1, "a", "2020", 4)), ("11", _torrent(1, "b", "2020", 4))])
+    torrent_data = {}
+    process_page(page, torrent_data)
+    assert torrent_data == {1: Pick("10", "a", 4)}
+
+
+def test_skips_non_torrents_and_gamedox():
+    page = _page([
+        ("10", _torrent(1, "link", "2020", 50, torrent_type="Link")),
+        ("11", _torrent(1, "dox", "2020", 40, game_dox="Update")),
+        ("12", _torrent(1, "game", "2020", 2)),
+    ])
+    torrent_data = {}
+    process_page(page, torrent_data)
+    assert torrent_data == {1: Pick("12", "game", 2)}
+
+
+def test_keeps_a_better_seeded_pick_from_an_earlier_page():
+    torrent_data = {1: Pick("10", "a", 9)}
+    process_page(_page([("11", _torrent(1, "b", "2020", 5))]), torrent_data)
+    assert torrent_data == {1: Pick("10", "a", 9)}
+    process_page(_page([("12", _torrent(1, "c", "2020", 12))]), torrent_data)
+    assert torrent_data == {1: Pick("12", "c", 12)}
+
+
+def test_drops_a_snatched_group():
+    torrent_data = {1: Pick("10", "a", 9)}
+    page = _page([("11", _torrent(1, "b", "2020", 5)), ("12", _torrent(1, "c", "2020", 1, snatched=True))])
+    process_page(page, torrent_data)
+    assert torrent_data == {}
+
+
+def test_since_only_picks_newer_torrents():
+    page = _page(
+        [("10", _torrent(1, "old", "2020", 9)), ("11", _torrent(1, "new", "2024", 3))],
+        [("20", _torrent(2, "older", "2019", 7))],
+    )
+    torrent_data = {}
+    assert process_page(page, torrent_data, since="2022") == ("2024", False)
+    assert torrent_data == {1: Pick("11", "new", 3)}
+
+
+def test_since_keeps_paging_while_every_group_is_new():
+    page = _page([("10", _torrent(1, "a", "2023", 1))], [("20", _torrent(2, "b", "2024", 1))])
+    torrent_data = {}
+    assert process_page(page, torrent_data, since="2022") == ("2024", True)
+    assert torrent_data == {1: Pick("10", "a", 1), 2: Pick("20", "b", 1)}
+
+
+def test_group_mixing_snatched_and_new_torrents_is_skipped_with_and_without_since():
+    page = _page([("10", _torrent(1, "old", "2020", 5, snatched=True)), ("11", _torrent(1, "new", "2024", 3))])
+    for since in (None, "2022"):
+        torrent_data = {}
+        process_page(page, torrent_data, since=since)
+        assert torrent_data == {}
@@ -0,0 +1,390 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+
+import lib.ggn_client as ggn_client
+from lib.ggn_client import GGNClient, GGNClientException, _SEARCH_FIELDS
+
+
+class _FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode()
+        self.headers = headers or {}
+
+
+class _FakeSession:
+    """stands in for the requests session of a client, every call is answered by `respond(params, headers)`"""
+
+    def __init__(self, respond):
+        self.headers = {}
+        self.calls = []
+        self._respond = respond
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        with self._lock:
+            self.calls.append((dict(params), headers))
+        return self._respond(params, headers)
+
+    def close(self):
+        pass
+
+
+def _answer(response, **headers):
+    content = json.dumps({"status": "success", "response": response}).encode()
+    return _FakeResponse(200, content, {"Content-Type": "application/json", **headers})
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """builds clients calling a fake session instead of the api, without waiting on the rate limit"""
+    monkeypatch.setattr(ggn_client, "RATE_LIMIT_CAPACITY", 1000.0)
+    clients = []
+
+    def make(respond, token="token", **kwargs):
+        client = GGNClient(token, session=_FakeSession(respond), **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _bool01(value):
+    # the old `int(value is True)`, except that values equal to True, such as 1, count as true since the boolean
+    # lookup table.
+    return int(value == True) if value is not None else None  # noqa: E712
+
+
+def _old_search_args(
+        search_type: str,
+        search_str: str = None,
+        group_name: str = None,
+        artist_name: str = None,
+        artist_check: str = None,
+        year: int = None,
+        remaster_title: str = None,
+        remaster_year: int = None,
+        release_title: str = None,
+        release_group: str = None,
+        file_list: str = None,
+        size_small: int = None,
+        size_large: int = None,
+        user_rating: int = None,
+        meta_rating: int = None,
+        ign_rating: int = None,
+        gs_rating: int = None,
+        encoding: str = None,
+        audio_format: str = None,
+        region: str = None,
+        language: str = None,
+        rating: str = None,
+        rating_strict: bool = None,
+        miscellaneous: str = None,
+        game_dox: str = None,
+        scene: bool = None,
+        dupable: int = None,
+        free_torrent: int = None,
+        checked: bool = None,
+        tag_list: str = None,
+        tags_type: bool = None,
+        hide_dead: bool = None,
+        empty_groups: str = None,
+        filter_cat_1: bool = None,
+        filter_cat_2: bool = None,
+        filter_cat_3: bool = None,
+        filter_cat_4: bool = None,
+        order_by: str = None,
+        order_way: str = None,
+        page: int = 1,
+):
+    """the arguments the search_torrents and search_requests methods built before `_build_search_args`, without the
+        unset ones the url builder left out. scene and rating_strict are sent as 1/0 since the boolean lookup table.
+    """
+    args = {
+        "search_type": search_type,
+        "searchstr": search_str,
+        "groupname": group_name,
+        "artistname": artist_name,
+        "artistcheck": artist_check,
+        "year": year,
+        "remastertitle": remaster_title,
+        "releasegroup": release_group,
+        "remasteryear": remaster_year,
+        "releasetitle": release_title,
+        "filelist": file_list,
+        "sizesmall": size_small,
+        "sizelarge": size_large,
+        "userrating": user_rating,
+        "metarating": meta_rating,
+        "ignrating": ign_rating,
+        "gsrating": gs_rating,
+        "encoding": encoding,
+        "audioformat": audio_format,
+        "region": region,
+        "language": language,
+        "rating": rating,
+        "rating_strict": _bool01(rating_strict),
+        "miscellaneous": miscellaneous,
+        "gamedox": game_dox,
+        "scene": _bool01(scene),
+        "dupable": dupable,
+        "freetorrent": free_torrent,
+        "checked": _bool01(checked),
+        "taglist": tag_list,
+        "tags_type": _bool01(tags_type),
+        "hide_dead": _bool01(hide_dead),
+        "emptygroups": empty_groups,
+        "filtercat[1]": _bool01(filter_cat_1),
+        "filtercat[2]": _bool01(filter_cat_2),
+        "filtercat[3]": _bool01(filter_cat_3),
+        "filtercat[4]": _bool01(filter_cat_4),
+        "order_by": order_by,
+        "order_way": order_way,
+        "page": page,
+    }
+    return {name: value for (name, value) in args.items() if value is not None}
+
+
+def _random_value(name, boolean, rng):
+    if boolean:
+        return rng.choice([None, True, False, 1, 0, "yes"])
+    if name == "page":
+        return rng.randint(1, 50)
+    if name == "tag_list":
+        return rng.choice([None, "action", "action,adventure"])
+    return rng.choice([None, "x", "two words", 7, 2000])
+
+
+@pytest.mark.parametrize("search_type", ["torrents", "requests"])
+def test_build_search_args_matches_old_arguments(search_type):
+    rng = random.Random(search_type)
+    for _ in range(500):
+        kwargs = {
+            name: _random_value(name, boolean, rng)
+            for (name, (_, boolean)) in _SEARCH_FIELDS.items()
+            if rng.random() < 0.5
+        }
+        assert GGNClient._build_search_args(search_type, **kwargs) == _old_search_args(search_type, **kwargs)
+
+
+def test_build_search_args_without_arguments():
+    assert GGNClient._build_search_args("torrents") == {"search_type": "torrents", "page": 1}
+
+
+def test_build_search_args_joins_tag_lists():
+    args = GGNClient._build_search_args("torrents", tag_list=["action", "adventure"])
+    assert args["taglist"] == "action,adventure"
+
+
+def test_build_search_args_rejects_unknown_arguments():
+    with pytest.raises(GGNClientException):
+        GGNClient._build_search_args("torrents", searchstr="x")
+
+
+@pytest.mark.parametrize("size", [1, 100000])
+def test_cached_answers_are_not_changed_by_callers(make_client, size):
+    client = make_client(lambda params, headers: _answer({"a": [1], "padding": "x" * size}))
+    client.get_wiki_article(1)["a"].append(2)
+    assert client.get_wiki_article(1)["a"] == [1]
+    assert len(client._session.calls) == 1
+
+
+def _echo(params, headers):
+    """answers every call with its arguments"""
+    return _answer(dict(params))
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_cache_counts_hits_and_misses(make_client):
+    client = make_client(_echo)
+    assert client.get_torrent(1) == client.get_torrent(1)
+    client.get_torrent(2)
+    assert len(client._session.calls) == 2
+    info = client.cache_info
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+    assert info.bytes_saved > 0
+
+    client.clear_cache()
+    assert client.cache_info == ggn_client.CacheInfo(0, 0, ggn_client.CACHE_MAXSIZE, 0, 0)
+
+
+def test_cache_entries_expire(make_client):
+    client = make_client(_echo, cache_ttl=0.05)
+    client.get_torrent(1)
+    time.sleep(0.1)
+    client.get_torrent(1)
+    assert len(client._session.calls) == 2
+
+
+def test_cache_ttl_of_zero_turns_the_cache_off(make_client):
+    client = make_client(_echo, cache_ttl=0)
+    client.get_torrent(1)
+    client.get_torrent(1)
+    assert len(client._session.calls) == 2
+    assert client.cache_info.currsize == 0
+
+
+def test_cache_evicts_the_least_recently_used_entry(make_client, monkeypatch):
+    monkeypatch.setattr(ggn_client, "CACHE_MAXSIZE", 2)
+    client = make_client(_echo)
+    client.get_torrent(1)
+    client.get_torrent(2)
+    client.get_torrent(1)
+    client.get_torrent(3)
+    assert len(client._session.calls) == 3
+    client.get_torrent(1)
+    assert len(client._session.calls) == 3
+    client.get_torrent(2)
+    assert len(client._session.calls) == 4
+
+
+def test_invalidate_forgets_one_action(make_client):
+    client = make_client(_echo)
+    client.get_torrent(1)
+    client.get_site_stats()
+    client.invalidate("torrent")
+    client.get_torrent(1)
+    client.get_site_stats()
+    assert [params["request"] for (params, _) in client._session.calls] == ["torrent", "site_stats", "torrent"]
+    client.invalidate()
+    client.get_site_stats()
+    assert len(client._session.calls) == 4
+
+
+def test_stale_answers_are_served_while_refreshing(make_client, monkeypatch):
+    monkeypatch.setitem(ggn_client.CACHE_TTLS, "site_stats", 0.05)
+    answers = iter(range(100))
+    client = make_client(lambda params, headers: _answer(next(answers)))
+    assert client.get_site_stats() == 0
+    time.sleep(0.1)
+    # the stale answer comes back right away, the fresh one is fetched in the background
+    assert client.get_site_stats() == 0
+    _wait_for(lambda: client.get_site_stats() == 1)
+    assert len(client._session.calls) == 2
+
+
+def test_expired_answers_are_revalidated(make_client, monkeypatch):
+    monkeypatch.setitem(ggn_client.CACHE_TTLS, "wiki", 0.05)
+
+    def respond(params, headers):
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return _FakeResponse(304)
+        return _answer({"body": "x" * 100}, ETag='"v1"')
+
+    client = make_client(respond)
+    first = client.get_wiki_article(1)
+    time.sleep(0.1)
+    assert client.get_wiki_article(1) == first
+    assert [headers for (_, headers) in client._session.calls] == [None, {"If-None-Match": '"v1"'}]
+    # the revalidated answer is cached again, and its body counts as saved
+    client.get_wiki_article(1)
+    assert len(client._session.calls) == 2
+    assert client.cache_info.bytes_saved > 200
+
+
+def test_large_answers_are_kept_compressed(make_client):
+    client = make_client(lambda params, headers: _answer({"body": "x" * 100000}))
+    answer = client.get_torrent(1)
+    [entry] = client._cache.values()
+    assert entry[5]
+    assert len(entry[2]) < 10000
+    assert client.get_torrent(1) == answer
+    assert client.cache_info.bytes_saved > 100000
+
+
+def test_disk_cache_is_shared_per_account(make_client, tmp_path):
+    first = make_client(_echo, cache_dir=str(tmp_path))
+    first.get_torrent(1)
+    same_account = make_client(_echo, cache_dir=str(tmp_path))
+    assert same_account.get_torrent(1) == {"request": "torrent", "id": 1}
+    assert len(same_account._session.calls) == 0
+    assert same_account.cache_info.hits == 1
+    other_account = make_client(_echo, token="other", cache_dir=str(tmp_path))
+    other_account.get_torrent(1)
+    assert len(other_account._session.calls) == 1
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_identical_calls_in_flight_share_one_call(make_client):
+    release = threading.Event()
+
+    def respond(params, headers):
+        release.wait(5)
+        return _answer({"id": 1})
+
+    client = make_client(respond)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.quick_user())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: len(client._session.calls) == 1)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{"id": 1}] * 5
+    assert len(client._session.calls) == 1
+
+
+def test_token_bucket_allows_bursts_then_paces_calls(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ggn_client.time, "sleep", sleeps.append)
+    with GGNClient("token", session=_FakeSession(_echo)) as client:
+        for _ in range(int(ggn_client.RATE_LIMIT_CAPACITY)):
+            client.quick_user()
+        assert sleeps == []
+        client.quick_user()
+    assert len(sleeps) == 1
+    assert sleeps[0] == pytest.approx(1 / ggn_client.RATE_LIMIT_REFILL_PER_SECOND, rel=0.1)
+
+
+def test_site_log_is_not_cached(make_client):
+    client = make_client(_echo)
+    client.get_site_log()
+    client.get_site_log()
+    assert len(client._session.calls) == 2
+
+
+def test_iter_search_items_stops_at_a_short_page(make_client):
+    def respond(params, headers):
+        count = params["limit"] if params["page"] < 3 else 1
+        return _answer({"page": params["page"], "items": [{"id": index} for index in range(count)]})
+
+    client = make_client(respond)
+    pages = list(client.iter_search_items(search="x", limit=5))
+    assert [page["page"] for page in pages] == [1, 2, 3]
+    assert len(client._session.calls) == 3
+
+
+def test_saving_the_user_keys_leaves_no_temporary_file_behind(make_client, monkeypatch, tmp_path):
+    def fail(source, destination):
+        raise OSError("disk full")
+
+    client = make_client(_echo)
+    client._user_file = str(tmp_path / "user.json")
+    monkeypatch.setattr(ggn_client.os, "replace", fail)
+    client._save_user({"authkey": "AUTH", "passkey": "PASS"})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stale_answers_are_served_after_close(make_client, monkeypatch):
+    monkeypatch.setitem(ggn_client.CACHE_TTLS, "site_stats", 0.05)
+    client = make_client(_echo)
+    client.get_site_stats()
+    client.close()
+    time.sleep(0.1)
+    assert client.get_site_stats() == {"request": "site_stats"}
+    assert len(client._session.calls) == 1
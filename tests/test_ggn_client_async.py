@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from lib.ggn_client import CacheInfo
+from lib.ggn_client_async import AsyncGGNClient
+
+
+def test_methods_become_coroutines_and_attributes_are_passed_through():
+    async def run():
+        async with AsyncGGNClient("token") as client:
+            assert asyncio.iscoroutinefunction(client.get_torrent)
+            assert isinstance(client.cache_info, CacheInfo)
+
+    asyncio.run(run())
+
+
+def test_blocking_iterators_are_left_out():
+    async def run():
+        async with AsyncGGNClient("token") as client:
+            with pytest.raises(AttributeError):
+                client.iter_site_log
+
+    asyncio.run(run())